@@ -1,22 +1,99 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import List, Tuple
+import hashlib
 import json
+import os
 from application import IoTNetworkService
 
 app = Flask(__name__)
-app.secret_key = 'iot-network-analysis-secret-key'
-app.config['SESSION_TYPE'] = 'filesystem'
+# Ключ подписи сессий и путь к БД задаются через окружение. Без
+# FLASK_SECRET_KEY приложение запускается только в режиме отладки
+# (FLASK_DEBUG=1) с ключом для локальной разработки
+app.secret_key = os.environ.get('FLASK_SECRET_KEY')
+if not app.secret_key:
+    if os.environ.get('FLASK_DEBUG') != '1':
+        raise RuntimeError('Не задана переменная окружения FLASK_SECRET_KEY')
+    app.secret_key = 'iot-network-analysis-dev-key'
+# Сессия хранится в подписанной cookie: без чтения/записи на диск
+# и без внешнего хранилища на каждый запрос
+
+# Предварительная компиляция шаблонов, чтобы первый запрос воркера
+# не тратил время на разбор Jinja (кэш окружения по умолчанию вмещает
+# 400 шаблонов, этого достаточно)
+for template_name in ('layout.html', 'index.html', 'network_info.html',
+                      'load_data.html', 'analyze.html'):
+    app.jinja_env.get_template(template_name)
 
 # Инициализация сервиса
-iot_service = IoTNetworkService()
+iot_service = IoTNetworkService(os.environ.get('IOT_DB_PATH', 'iot_network.db'))
+
+# Пример данных устройств (в реальном приложении будет загрузка файла)
+SAMPLE_DEVICES = [
+    {'original_id': 101, 'name': 'Температурный датчик', 'type': 'sensor', 'status': 'active'},
+    {'original_id': 102, 'name': 'Датчик влажности', 'type': 'sensor', 'status': 'active'},
+    {'original_id': 103, 'name': 'Умный светильник', 'type': 'actuator', 'status': 'active'},
+    {'original_id': 104, 'name': 'Кондиционер', 'type': 'actuator', 'status': 'active'},
+    {'original_id': 105, 'name': 'Шлюз Zigbee', 'type': 'gateway', 'status': 'active'},
+    {'original_id': 106, 'name': 'Датчик движения', 'type': 'sensor', 'status': 'inactive'}
+]
+
+# Пример связей
+SAMPLE_CONNECTIONS: List[Tuple[int, int]] = [
+    (101, 105), (102, 105), (105, 103), (105, 104),
+    (101, 104), (101, 104), (103, 104), (106, 105)
+]
+
+# Пример источников данных (last_update подставляется при загрузке)
+SAMPLE_DATA_SOURCES = [
+    {'name': 'Home Assistant API', 'type': 'api'},
+    {'name': 'MQTT Broker', 'type': 'stream'}
+]
+
+# Примеры данных для API (сериализуются один раз при старте)
+SAMPLE_DATA = {
+    'devices': [
+        {'id': 1, 'name': 'Датчик температуры', 'type': 'sensor', 'status': 'active'},
+        {'id': 2, 'name': 'Датчик влажности', 'type': 'sensor', 'status': 'active'},
+        {'id': 3, 'name': 'Умная лампа', 'type': 'actuator', 'status': 'active'},
+        {'id': 4, 'name': 'Кондиционер', 'type': 'actuator', 'status': 'active'},
+        {'id': 5, 'name': 'Шлюз', 'type': 'gateway', 'status': 'active'}
+    ],
+    'connections': [
+        {'from': 1, 'to': 5},
+        {'from': 2, 'to': 5},
+        {'from': 5, 'to': 3},
+        {'from': 5, 'to': 4},
+        {'from': 1, 'to': 4}
+    ]
+}
+SAMPLE_DATA_JSON = app.json.dumps(SAMPLE_DATA).encode('utf-8')
+SAMPLE_DATA_ETAG = hashlib.sha1(SAMPLE_DATA_JSON).hexdigest()
+
+@lru_cache(maxsize=None)
+def static_url(endpoint: str) -> str:
+    """URL страницы без параметров (строится один раз)"""
+    return url_for(endpoint)
+
+# Страницы, доступные только авторизованным пользователям
+PROTECTED_ENDPOINTS = frozenset({
+    'dashboard', 'create_network', 'network_details',
+    'load_data', 'analyze_network'
+})
+
+@app.before_request
+def require_auth():
+    """Перенаправить неавторизованного пользователя на главную"""
+    if request.endpoint in PROTECTED_ENDPOINTS and 'user_id' not in session:
+        return redirect(static_url('index'))
 
 @app.route('/')
 def index():
     """Главная страница с авторизацией"""
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(static_url('dashboard'))
     return render_template('index.html')
 
 @app.route('/login', methods=['POST'])
@@ -32,37 +109,30 @@ def login():
         session['user_name'] = user['name']
         session['user_role'] = user['role']
         flash(f'Добро пожаловать, {user["name"]}!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(static_url('dashboard'))
     else:
         flash('Неверный логин или пароль', 'error')
-        return redirect(url_for('index'))
+        return redirect(static_url('index'))
 
 @app.route('/logout')
 def logout():
     """Выход из системы"""
     session.clear()
     flash('Вы успешно вышли из системы', 'info')
-    return redirect(url_for('index'))
+    return redirect(static_url('index'))
 
 @app.route('/dashboard')
 def dashboard():
     """Панель управления"""
-    if 'user_id' not in session:
-        return redirect(url_for('index'))
-    
     # Получить сети пользователя
     networks = iot_service.get_all_networks(session['user_id'])
     
-    return render_template('network_info.html', 
-                         networks=networks,
-                         user_role=session.get('user_role'))
+    return render_template('network_info.html',
+                         networks=networks)
 
 @app.route('/create_network', methods=['POST'])
 def create_network():
     """Создать новую IoT сеть"""
-    if 'user_id' not in session:
-        return redirect(url_for('index'))
-    
     name = request.form.get('network_name')
     description = request.form.get('description', '')
     
@@ -70,72 +140,37 @@ def create_network():
         iot_service.create_network(name, description, session['user_id'])
         flash(f'Сеть "{name}" успешно создана', 'success')
     
-    return redirect(url_for('dashboard'))
+    return redirect(static_url('dashboard'))
 
 @app.route('/network/<int:network_id>')
 def network_details(network_id):
     """Детальная информация о сети"""
-    if 'user_id' not in session:
-        return redirect(url_for('index'))
-    
     network_info = iot_service.get_network_details(network_id)
     
     if not network_info:
         flash('Сеть не найдена', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(static_url('dashboard'))
     
     return render_template('network_info.html',
-                         network_info=network_info,
-                         user_role=session.get('user_role'))
+                         network_info=network_info)
 
 @app.route('/load_data/<int:network_id>', methods=['GET', 'POST'])
 def load_data(network_id):
     """Страница загрузки данных IoT (прецедент 1)"""
-    if 'user_id' not in session:
-        return redirect(url_for('index'))
-    
     if request.method == 'POST':
-        # Получение данных из формы
-        devices_data = []
-        connections_data = []
-        data_sources_data = []
-        
         try:
-            # Пример данных устройств (в реальном приложении будет загрузка файла)
-            sample_devices = [
-                {'original_id': 101, 'name': 'Температурный датчик', 'type': 'sensor', 'status': 'active'},
-                {'original_id': 102, 'name': 'Датчик влажности', 'type': 'sensor', 'status': 'active'},
-                {'original_id': 103, 'name': 'Умный светильник', 'type': 'actuator', 'status': 'active'},
-                {'original_id': 104, 'name': 'Кондиционер', 'type': 'actuator', 'status': 'active'},
-                {'original_id': 105, 'name': 'Шлюз Zigbee', 'type': 'gateway', 'status': 'active'},
-                {'original_id': 106, 'name': 'Датчик движения', 'type': 'sensor', 'status': 'inactive'}
-            ]
-            
-            # Пример связей
-            sample_connections: List[Tuple[int, int]] = [
-                (101, 105), (102, 105), (105, 103), (105, 104),
-                (101, 104), (101, 104), (103, 104), (106, 105)
-            ]
-            
-            # Пример источников данных
+            # Пример источников данных: меняется только время обновления
+            now = datetime.now()
             sample_data_sources = [
-                {
-                    'name': 'Home Assistant API',
-                    'type': 'api',
-                    'last_update': (datetime.now() - timedelta(hours=2)).isoformat()
-                },
-                {
-                    'name': 'MQTT Broker',
-                    'type': 'stream',
-                    'last_update': datetime.now().isoformat()
-                }
+                {**SAMPLE_DATA_SOURCES[0], 'last_update': (now - timedelta(hours=2)).isoformat()},
+                {**SAMPLE_DATA_SOURCES[1], 'last_update': now.isoformat()}
             ]
             
             # Вызов прецедента загрузки данных
             result = iot_service.load_iot_data(
                 network_id=network_id,
-                devices_data=sample_devices,
-                connections_data=sample_connections,
+                devices_data=SAMPLE_DEVICES,
+                connections_data=SAMPLE_CONNECTIONS,
                 data_sources_data=sample_data_sources
             )
             
@@ -153,55 +188,36 @@ def load_data(network_id):
     network_info = iot_service.get_network_details(network_id)
     
     return render_template('load_data.html',
-                         network_info=network_info,
-                         user_role=session.get('user_role'))
+                         network_info=network_info)
 
 @app.route('/analyze/<int:network_id>', methods=['GET', 'POST'])
 def analyze_network(network_id):
     """Страница анализа топологии (прецедент 2)"""
-    if 'user_id' not in session:
-        return redirect(url_for('index'))
-    
-    network_info = iot_service.get_network_details(network_id)
-    
     if request.method == 'POST':
         # Вызов прецедента анализа
         result = iot_service.analyze_topology_and_connections(network_id)
         
         if result['success']:
             return render_template('analyze.html',
-                                 network_info=network_info,
-                                 analysis_result=result,
-                                 user_role=session.get('user_role'))
+                                 network_info=iot_service.get_network_details(network_id),
+                                 analysis_result=result)
         else:
             flash(f'Ошибка анализа: {result["error"]}', 'error')
             return redirect(url_for('network_details', network_id=network_id))
     
     return render_template('analyze.html',
-                         network_info=network_info,
-                         analysis_result=None,
-                         user_role=session.get('user_role'))
+                         network_info=iot_service.get_network_details(network_id),
+                         analysis_result=None)
 
 @app.route('/api/get_sample_data')
 def get_sample_data():
     """API для получения примеров данных"""
-    sample_data = {
-        'devices': [
-            {'id': 1, 'name': 'Датчик температуры', 'type': 'sensor', 'status': 'active'},
-            {'id': 2, 'name': 'Датчик влажности', 'type': 'sensor', 'status': 'active'},
-            {'id': 3, 'name': 'Умная лампа', 'type': 'actuator', 'status': 'active'},
-            {'id': 4, 'name': 'Кондиционер', 'type': 'actuator', 'status': 'active'},
-            {'id': 5, 'name': 'Шлюз', 'type': 'gateway', 'status': 'active'}
-        ],
-        'connections': [
-            {'from': 1, 'to': 5},
-            {'from': 2, 'to': 5},
-            {'from': 5, 'to': 3},
-            {'from': 5, 'to': 4},
-            {'from': 1, 'to': 4}
-        ]
-    }
-    return jsonify(sample_data)
+    response = Response(SAMPLE_DATA_JSON, mimetype='application/json')
+    response.set_etag(SAMPLE_DATA_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    # Ответ 304 без тела, если у клиента актуальная копия
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', port=5000)
\ No newline at end of file
@@ -1,178 +1,340 @@
 # application.py
+import atexit
+import json
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import wraps
+from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
+from werkzeug.security import check_password_hash, generate_password_hash
 from domain_models import (
-    Device, DeviceStatus, DeviceType,
-    DataSource, DataSourceType,
-    IoTNetwork, AnalysisResult
+    Device, DataSource,
+    IoTNetwork, AnalysisResult,
+    DEVICE_STATUS_BY_VALUE, DEVICE_TYPE_BY_VALUE, DATA_SOURCE_TYPE_BY_VALUE
 )
 from gateways import (
     DeviceGateway, DataSourceGateway,
     AnalysisGateway, IoTNetworkGateway
 )
 
+# Настройки соединений SQLite (режим журнала задается соединением на запись)
+SQLITE_PRAGMAS = (
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-20000',
+    'mmap_size=268435456',
+    'foreign_keys=ON',
+)
+
+# Схема БД: таблицы и индексы, по одному оператору на элемент
+SCHEMA_STATEMENTS = (
+    # Таблица пользователей (для авторизации)
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        login TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('admin', 'analyst'))
+    )
+    ''',
+    # Таблица IoT сетей
+    '''
+    CREATE TABLE IF NOT EXISTS iot_networks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT,
+        network_name TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        user_id INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    # Таблица устройств
+    '''
+    CREATE TABLE IF NOT EXISTS devices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        device_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        type TEXT NOT NULL,
+        network_id INTEGER NOT NULL,
+        FOREIGN KEY (network_id) REFERENCES iot_networks (id)
+    )
+    ''',
+    # Таблица связей между устройствами
+    '''
+    CREATE TABLE IF NOT EXISTS device_connections (
+        id INTEGER PRIMARY KEY,  -- без AUTOINCREMENT: id строки наружу не передается
+        device_id INTEGER NOT NULL,
+        connected_device_id INTEGER NOT NULL,
+        FOREIGN KEY (device_id) REFERENCES devices (id)
+    )
+    ''',
+    # Таблица источников данных
+    '''
+    CREATE TABLE IF NOT EXISTS data_sources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        datasource_name TEXT NOT NULL,
+        last_update TEXT NOT NULL,
+        type TEXT NOT NULL,
+        network_id INTEGER NOT NULL,
+        FOREIGN KEY (network_id) REFERENCES iot_networks (id)
+    )
+    ''',
+    # Таблица результатов анализа
+    '''
+    CREATE TABLE IF NOT EXISTS analysis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        centrality_score REAL NOT NULL,
+        date TEXT NOT NULL,
+        network_id INTEGER NOT NULL,
+        FOREIGN KEY (network_id) REFERENCES iot_networks (id)
+    )
+    ''',
+    # Таблица изолированных узлов
+    '''
+    CREATE TABLE IF NOT EXISTS isolated_nodes (
+        id INTEGER PRIMARY KEY,  -- без AUTOINCREMENT: id строки наружу не передается
+        analysis_id INTEGER NOT NULL,
+        device_id INTEGER NOT NULL,
+        FOREIGN KEY (analysis_id) REFERENCES analysis (id)
+    )
+    ''',
+    # Таблица избыточных связей
+    '''
+    CREATE TABLE IF NOT EXISTS redundant_links (
+        id INTEGER PRIMARY KEY,  -- без AUTOINCREMENT: id строки наружу не передается
+        analysis_id INTEGER NOT NULL,
+        device_id1 INTEGER NOT NULL,
+        device_id2 INTEGER NOT NULL,
+        FOREIGN KEY (analysis_id) REFERENCES analysis (id)
+    )
+    ''',
+    # Индексы по внешним ключам для выборок по сети, устройству и пользователю
+    'CREATE INDEX IF NOT EXISTS idx_iot_networks_user_created ON iot_networks (user_id, created_at)',
+    # Покрывающий индекс: список устройств сети читается в порядке (type, device_name)
+    # без обращения к таблице и без сортировки
+    'CREATE INDEX IF NOT EXISTS idx_devices_network_cover ON devices (network_id, type, device_name, status)',
+    'CREATE INDEX IF NOT EXISTS idx_device_connections_device ON device_connections (device_id)',
+    'CREATE INDEX IF NOT EXISTS idx_data_sources_network ON data_sources (network_id)',
+    'CREATE INDEX IF NOT EXISTS idx_analysis_network_date ON analysis (network_id, date)',
+    'CREATE INDEX IF NOT EXISTS idx_isolated_nodes_analysis ON isolated_nodes (analysis_id)',
+    'CREATE INDEX IF NOT EXISTS idx_redundant_links_analysis ON redundant_links (analysis_id)',
+)
+
+# Версия схемы БД (PRAGMA user_version); увеличивается при любом изменении
+# SCHEMA_STATEMENTS или начальных данных, чтобы _init_database выполнился повторно
+SCHEMA_VERSION = 1
+
+# Число соединений только для чтения
+READ_POOL_SIZE = 4
+
+# Пути, открывающие приватную БД в памяти (пул чтения для них невозможен)
+IN_MEMORY_DB_PATHS = ('', ':memory:')
+
+# Размер кэша подготовленных выражений на соединение: все запросы сервиса
+# и gateways используют постоянный текст SQL и не разбираются повторно
+STATEMENT_CACHE_SIZE = 256
+
+# Правила рекомендаций по результату анализа: (условие, шаблон текста)
+RECOMMENDATION_RULES = (
+    (lambda analysis: bool(analysis.isolated_nodes),
+     "Обнаружено {isolated} изолированных устройств. "
+     "Рекомендуется проверить их подключение к сети или удалить, если они не используются."),
+    (lambda analysis: bool(analysis.redundant_links),
+     "Обнаружено {redundant} избыточных связей. "
+     "Рекомендуется удалить дублирующиеся связи для оптимизации сети."),
+    (lambda analysis: analysis.centrality_score < 0.3,
+     "Низкая центральность сети ({centrality:.2f}). "
+     "Рекомендуется добавить больше связей между ключевыми устройствами."),
+    (lambda analysis: analysis.centrality_score > 0.7,
+     "Высокая центральность сети ({centrality:.2f}). "
+     "Сеть может быть перегружена - рассмотрите возможность распределения нагрузки."),
+)
+DEFAULT_RECOMMENDATION = "Сеть в хорошем состоянии. Серьезных проблем не обнаружено."
+
+
+def _serialized_write(method):
+    """Выполнять метод под блокировкой соединения на запись"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class IoTNetworkService:
     """Сервисный слой для работы с IoT сетями"""
     
     def __init__(self, db_path: str = 'iot_network.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Единственное соединение на запись разделяется потоками процесса
+        # (check_same_thread=False); пишущие методы выполняются под блокировкой.
+        # isolation_level=None: модуль sqlite3 не открывает транзакции неявно,
+        # многошаговые записи явно выполняются в BEGIN ... COMMIT
+        self.conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            isolation_level=None
+        )
         self.conn.row_factory = sqlite3.Row  # Для работы со строками как словарями
+        self._write_lock = threading.Lock()
+        self._closed = False
+        
+        # WAL-журнал: читатели не блокируют писателя, а фиксация транзакции
+        # не требует полной синхронизации файла БД
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Контрольная точка реже, чем каждые 1000 страниц: массовая загрузка
+        # не прерывается на перенос WAL в основной файл
+        self.conn.execute('PRAGMA wal_autocheckpoint=10000')
+        for pragma in SQLITE_PRAGMAS:
+            self.conn.execute(f'PRAGMA {pragma}')
         self._init_database()
         
+        # Пул соединений только для чтения: в режиме WAL чтения
+        # выполняются параллельно с записью. БД в памяти видна только
+        # своему соединению, поэтому для нее пул не создается
+        self._read_pool: Optional[queue.Queue] = None
+        if db_path not in IN_MEMORY_DB_PATHS:
+            self._read_pool = queue.Queue()
+            read_uri = f'{Path(db_path).resolve().as_uri()}?mode=ro'
+            for _ in range(READ_POOL_SIZE):
+                reader = sqlite3.connect(
+                    read_uri,
+                    uri=True,
+                    check_same_thread=False,
+                    cached_statements=STATEMENT_CACHE_SIZE
+                )
+                reader.row_factory = sqlite3.Row
+                for pragma in SQLITE_PRAGMAS:
+                    reader.execute(f'PRAGMA {pragma}')
+                self._read_pool.put(reader)
+        
         # Инициализация gateways
         self.device_gateway = DeviceGateway(self.conn)
         self.data_source_gateway = DataSourceGateway(self.conn)
         self.analysis_gateway = AnalysisGateway(self.conn)
         self.network_gateway = IoTNetworkGateway(self.conn)
+        
+        # Соединения закрываются и при завершении процесса без явного close()
+        atexit.register(self.close)
+    
+    @contextmanager
+    def _reader(self):
+        """
+        Взять соединение только для чтения из пула
+        Без пула (БД в памяти) чтение идет через соединение на запись
+        """
+        if self._read_pool is None:
+            with self._write_lock:
+                yield self.conn
+            return
+        
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
     
     def _init_database(self):
         """Инициализировать структуру БД"""
         cursor = self.conn.cursor()
         
-        # Таблица пользователей (для авторизации)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                login TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL CHECK(role IN ('admin', 'analyst'))
-            )
-        ''')
-        
-        # Таблица IoT сетей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS iot_networks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                description TEXT,
-                network_name TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица устройств
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS devices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                device_name TEXT NOT NULL,
-                status TEXT NOT NULL,
-                type TEXT NOT NULL,
-                network_id INTEGER NOT NULL,
-                FOREIGN KEY (network_id) REFERENCES iot_networks (id)
-            )
-        ''')
-        
-        # Таблица связей между устройствами
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS device_connections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                device_id INTEGER NOT NULL,
-                connected_device_id INTEGER NOT NULL,
-                FOREIGN KEY (device_id) REFERENCES devices (id)
-            )
-        ''')
+        # БД уже инициализирована текущей версией схемы
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return
         
-        # Таблица источников данных
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS data_sources (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                datasource_name TEXT NOT NULL,
-                last_update TEXT NOT NULL,
-                type TEXT NOT NULL,
-                network_id INTEGER NOT NULL,
-                FOREIGN KEY (network_id) REFERENCES iot_networks (id)
-            )
-        ''')
-        
-        # Таблица результатов анализа
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                centrality_score REAL NOT NULL,
-                date TEXT NOT NULL,
-                network_id INTEGER NOT NULL,
-                FOREIGN KEY (network_id) REFERENCES iot_networks (id)
-            )
-        ''')
-        
-        # Таблица изолированных узлов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS isolated_nodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_id INTEGER NOT NULL,
-                device_id INTEGER NOT NULL,
-                FOREIGN KEY (analysis_id) REFERENCES analysis (id)
-            )
-        ''')
-        
-        # Таблица избыточных связей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS redundant_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_id INTEGER NOT NULL,
-                device_id1 INTEGER NOT NULL,
-                device_id2 INTEGER NOT NULL,
-                FOREIGN KEY (analysis_id) REFERENCES analysis (id)
-            )
-        ''')
-        
-        # Создаем тестового пользователя, если нет
-        cursor.execute("SELECT COUNT(*) FROM users WHERE login='admin'")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO users (name, login, password, role)
-                VALUES (?, ?, ?, ?)
-            ''', ('Администратор', 'admin', 'admin123', 'admin'))
+        # Несколько процессов могут инициализировать БД одновременно:
+        # блокировка на запись берется до любого чтения (в режиме WAL
+        # транзакция, начатая чтением, не может перейти к записи после
+        # чужой фиксации), а версия схемы перечитывается под блокировкой
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                self.conn.commit()
+                return
             
-            cursor.execute('''
-                INSERT INTO users (name, login, password, role)
-                VALUES (?, ?, ?, ?)
-            ''', ('Аналитик', 'analyst', 'analyst123', 'analyst'))
-        
-        self.conn.commit()
+            # executescript фиксирует открытую транзакцию, поэтому операторы
+            # схемы выполняются по одному внутри нее
+            for statement in SCHEMA_STATEMENTS:
+                cursor.execute(statement)
+            
+            # Перевести пароли из открытого вида (старая схема) в хэши
+            cursor.execute('PRAGMA table_info(users)')
+            if 'password' in {row['name'] for row in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE users RENAME COLUMN password TO password_hash')
+                cursor.execute('SELECT id, password_hash FROM users')
+                for row in cursor.fetchall():
+                    cursor.execute('''
+                        UPDATE users SET password_hash = ? WHERE id = ?
+                    ''', (generate_password_hash(row['password_hash']), row['id']))
+            
+            # Создаем тестовых пользователей, если их нет (хэши паролей
+            # вычисляются только тогда, когда вставка действительно нужна)
+            cursor.execute("SELECT COUNT(*) FROM users WHERE login IN ('admin', 'analyst')")
+            if cursor.fetchone()[0] < 2:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO users (name, login, password_hash, role)
+                    VALUES (?, ?, ?, ?)
+                ''', [
+                    ('Администратор', 'admin', generate_password_hash('admin123'), 'admin'),
+                    ('Аналитик', 'analyst', generate_password_hash('analyst123'), 'analyst')
+                ])
+            
+            # Собрать статистику для планировщика запросов, если её ещё нет
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                cursor.execute('ANALYZE')
+            
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
     
     def authenticate_user(self, login: str, password: str) -> Optional[Dict]:
         """Аутентификация пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, name, login, role 
-            FROM users 
-            WHERE login = ? AND password = ?
-        ''', (login, password))
-        
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, name, login, role, password_hash 
+                FROM users 
+                WHERE login = ?
+            ''', (login,))
+            
+            row = cursor.fetchone()
+            if row and check_password_hash(row['password_hash'], password or ''):
+                user = dict(row)
+                del user['password_hash']
+                return user
+            return None
     
     def get_all_networks(self, user_id: Optional[int] = None) -> List[Dict]:
         """Получить все сети пользователя"""
-        cursor = self.conn.cursor()
-        
-        if user_id:
-            cursor.execute('''
-                SELECT id, network_name, description, created_at 
-                FROM iot_networks 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC
-            ''', (user_id,))
-        else:
-            cursor.execute('''
-                SELECT id, network_name, description, created_at 
-                FROM iot_networks 
-                ORDER BY created_at DESC
-            ''')
-        
-        networks = []
-        for row in cursor.fetchall():
-            networks.append(dict(row))
-        
-        return networks
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            
+            if user_id:
+                cursor.execute('''
+                    SELECT id, network_name, description, created_at 
+                    FROM iot_networks 
+                    WHERE user_id = ? 
+                    ORDER BY created_at DESC
+                ''', (user_id,))
+            else:
+                cursor.execute('''
+                    SELECT id, network_name, description, created_at 
+                    FROM iot_networks 
+                    ORDER BY created_at DESC
+                ''')
+            
+            return [dict(row) for row in cursor]
     
+    @_serialized_write
     def create_network(self, name: str, description: str = "", user_id: Optional[int] = None) -> Dict:
         """Создать новую IoT сеть"""
         cursor = self.conn.cursor()
@@ -184,8 +346,6 @@ class IoTNetworkService:
         
         network_id = cursor.lastrowid
         
-        self.conn.commit()
-        
         return {
             'id': network_id,
             'network_name': name,
@@ -193,6 +353,7 @@ class IoTNetworkService:
             'user_id': user_id
         }
     
+    @_serialized_write
     def load_iot_data(
         self,
         network_id: int,
@@ -209,57 +370,72 @@ class IoTNetworkService:
             if not network:
                 return {'success': False, 'error': f"Сеть с ID {network_id} не найдена"}
             
-            # Загрузить устройства
-            devices_dict = {}
-            device_ids_map = {}  # Соответствие оригинальных ID и реальных ID
+            # Вся загрузка выполняется одной транзакцией; блокировка на запись
+            # берется сразу, чтобы не получить SQLITE_BUSY посреди загрузки
+            self.conn.execute('BEGIN IMMEDIATE')
             
-            for device_data in devices_data:
-                device = Device(
+            # Локальные ссылки на конструкторы: без поиска глобальных имен
+            # на каждой итерации
+            device_cls, data_source_cls = Device, DataSource
+            device_status, device_type = DEVICE_STATUS_BY_VALUE, DEVICE_TYPE_BY_VALUE
+            data_source_type = DATA_SOURCE_TYPE_BY_VALUE
+            from_iso = datetime.fromisoformat
+            
+            # Загрузить устройства
+            devices = [
+                device_cls(
                     id=0,
                     device_name=device_data['name'],
-                    status=DeviceStatus(device_data.get('status', 'active')),
-                    type=DeviceType(device_data['type']),
+                    status=device_status[device_data.get('status', 'active')],
+                    type=device_type[device_data['type']],
                     connections=[]
                 )
-                
-                # Вставить в БД
-                device_id = self.device_gateway.insert(device, network_id)
-                devices_dict[device_id] = device
-                device_ids_map[device_data['original_id']] = device_id
-                
-                # Добавить в доменную модель
-                network.add_device(device)
+                for device_data in devices_data
+            ]
+            
+            # Вставить в БД
+            self.device_gateway.insert_many(devices, network_id)
+            
+            # Соответствие оригинальных ID и устройств (с уже присвоенными ID)
+            devices_map = {
+                device_data['original_id']: device
+                for device_data, device in zip(devices_data, devices)
+            }
+            
+            # Добавить в доменную модель
+            add_device = network.add_device
+            for device in devices:
+                add_device(device)
             
-            # Загрузить связи
-            connection_count = 0
+            # Загрузить связи: по одному поиску в словаре на каждый конец связи
+            connections = []
+            get_mapped = devices_map.get
             for source_orig_id, target_orig_id in connections_data:
-                if source_orig_id in device_ids_map and target_orig_id in device_ids_map:
-                    source_id = device_ids_map[source_orig_id]
-                    target_id = device_ids_map[target_orig_id]
-                    
+                source_device = get_mapped(source_orig_id)
+                target_device = get_mapped(target_orig_id)
+                if source_device is not None and target_device is not None:
                     # Добавить связь в доменную модель
-                    if source_device := network.get_device(source_id):
-                        source_device.add_connection(target_id)
-                    
-                    # Добавить связь в БД
-                    cursor = self.conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO device_connections (device_id, connected_device_id)
-                        VALUES (?, ?)
-                    ''', (source_id, target_id))
+                    source_device.add_connection(target_device.id)
                     
-                    connection_count += 1
+                    connections.append((source_device.id, target_device.id))
+            
+            # Добавить связи в БД
+            self.device_gateway.insert_connections(connections)
+            connection_count = len(connections)
             
             # Загрузить источники данных
-            for ds_data in data_sources_data:
-                data_source = DataSource(
+            data_sources = [
+                data_source_cls(
                     id=0,
                     datasource_name=ds_data['name'],
-                    last_update=datetime.fromisoformat(ds_data['last_update']),
-                    type=DataSourceType(ds_data['type'])
+                    last_update=from_iso(ds_data['last_update']),
+                    type=data_source_type[ds_data['type']]
                 )
-                
-                self.data_source_gateway.insert(data_source, network_id)
+                for ds_data in data_sources_data
+            ]
+            
+            self.data_source_gateway.insert_many(data_sources, network_id)
+            for data_source in data_sources:
                 network.add_data_source(data_source)
             
             self.conn.commit()
@@ -274,9 +450,11 @@ class IoTNetworkService:
             }
             
         except Exception as e:
-            self.conn.rollback()
+            if self.conn.in_transaction:
+                self.conn.rollback()
             return {'success': False, 'error': str(e)}
     
+    @_serialized_write
     def analyze_topology_and_connections(self, network_id: int) -> Dict[str, Any]:
         """
         Проанализировать топологию и связи сети
@@ -305,40 +483,29 @@ class IoTNetworkService:
             # Сохранить результат анализа
             analysis_id = self.analysis_gateway.insert(analysis_result, network_id)
             
-            # Получить детальную информацию об устройствах для изолированных узлов
+            # Сведения об устройствах уже загружены в доменную модель,
+            # поэтому отдельные запросы к БД на каждый узел не нужны
             isolated_devices_info = []
             for node_id in analysis_result.isolated_nodes:
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    SELECT device_name, type, status 
-                    FROM devices 
-                    WHERE id = ?
-                ''', (node_id,))
-                device_info = cursor.fetchone()
-                if device_info:
+                if device := network.get_device(node_id):
                     isolated_devices_info.append({
                         'id': node_id,
-                        'name': device_info['device_name'],
-                        'type': device_info['type'],
-                        'status': device_info['status']
+                        'name': device.device_name,
+                        'type': device.type.value,
+                        'status': device.status.value
                     })
             
             # Получить информацию об избыточных связях
             redundant_links_info = []
             for link in analysis_result.redundant_links:
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    SELECT d1.device_name as device1_name, d2.device_name as device2_name
-                    FROM devices d1, devices d2
-                    WHERE d1.id = ? AND d2.id = ?
-                ''', (link[0], link[1]))
-                link_info = cursor.fetchone()
-                if link_info:
+                device1 = network.get_device(link[0])
+                device2 = network.get_device(link[1])
+                if device1 and device2:
                     redundant_links_info.append({
                         'device1_id': link[0],
                         'device2_id': link[1],
-                        'device1_name': link_info['device1_name'],
-                        'device2_name': link_info['device2_name']
+                        'device1_name': device1.device_name,
+                        'device2_name': device2.device_name
                     })
             
             return {
@@ -358,110 +525,122 @@ class IoTNetworkService:
             }
             
         except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
             return {'success': False, 'error': str(e)}
     
     def _generate_recommendations(self, analysis: AnalysisResult) -> List[str]:
         """Сгенерировать рекомендации на основе анализа"""
-        recommendations = []
-        
-        if analysis.isolated_nodes:
-            recommendations.append(
-                f"Обнаружено {len(analysis.isolated_nodes)} изолированных устройств. "
-                "Рекомендуется проверить их подключение к сети или удалить, если они не используются."
-            )
-        
-        if analysis.redundant_links:
-            recommendations.append(
-                f"Обнаружено {len(analysis.redundant_links)} избыточных связей. "
-                "Рекомендуется удалить дублирующиеся связи для оптимизации сети."
-            )
-        
-        if analysis.centrality_score < 0.3:
-            recommendations.append(
-                f"Низкая центральность сети ({analysis.centrality_score:.2f}). "
-                "Рекомендуется добавить больше связей между ключевыми устройствами."
-            )
-        elif analysis.centrality_score > 0.7:
-            recommendations.append(
-                f"Высокая центральность сети ({analysis.centrality_score:.2f}). "
-                "Сеть может быть перегружена - рассмотрите возможность распределения нагрузки."
+        # Текст формируется только для сработавших правил
+        recommendations = [
+            template.format(
+                isolated=len(analysis.isolated_nodes),
+                redundant=len(analysis.redundant_links),
+                centrality=analysis.centrality_score
             )
-        
-        if not recommendations:
-            recommendations.append("Сеть в хорошем состоянии. Серьезных проблем не обнаружено.")
-        
-        return recommendations
+            for applies, template in RECOMMENDATION_RULES
+            if applies(analysis)
+        ]
+        return recommendations or [DEFAULT_RECOMMENDATION]
     
     def get_network_details(self, network_id: int) -> Dict[str, Any]:
         """Получить детальную информацию о сети"""
-        cursor = self.conn.cursor()
-        
-        # Основная информация о сети
-        cursor.execute('''
-            SELECT n.*, u.name as user_name 
-            FROM iot_networks n 
-            LEFT JOIN users u ON n.user_id = u.id 
-            WHERE n.id = ?
-        ''', (network_id,))
-        
-        network_row = cursor.fetchone()
-        if not network_row:
-            return {}
-        
-        network_info = dict(network_row)
-        
-        # Устройства сети
-        cursor.execute('''
-            SELECT id, device_name, type, status 
-            FROM devices 
-            WHERE network_id = ? 
-            ORDER BY type, device_name
-        ''', (network_id,))
-        
-        devices = [dict(row) for row in cursor.fetchall()]
-        
-        # Источники данных
-        cursor.execute('''
-            SELECT id, datasource_name, type, last_update 
-            FROM data_sources 
-            WHERE network_id = ?
-        ''', (network_id,))
-        
-        data_sources = [dict(row) for row in cursor.fetchall()]
-        
-        # История анализов
-        cursor.execute('''
-            SELECT id, centrality_score, date 
-            FROM analysis 
-            WHERE network_id = ? 
-            ORDER BY date DESC 
-            LIMIT 5
-        ''', (network_id,))
-        
-        analyses = [dict(row) for row in cursor.fetchall()]
-        
-        # Статистика связей
-        cursor.execute('''
-            SELECT COUNT(*) as total_connections 
-            FROM device_connections 
-            WHERE device_id IN (SELECT id FROM devices WHERE network_id = ?)
-        ''', (network_id,))
-        
-        connections_stat = cursor.fetchone()
-        
-        return {
-            'network': network_info,
-            'devices': devices,
-            'data_sources': data_sources,
-            'analyses': analyses,
-            'stats': {
-                'total_devices': len(devices),
-                'total_data_sources': len(data_sources),
-                'total_analyses': len(analyses),
-                'total_connections': connections_stat['total_connections'] if connections_stat else 0
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            
+            # Информация о сети собирается одним запросом в JSON-документ.
+            # Анализы в него не входят: JSON1 выводит REAL с 15 значащими
+            # цифрами, и centrality_score терял бы точность
+            cursor.execute('''
+                SELECT json_object(
+                    'network', json_object(
+                        'id', n.id,
+                        'description', n.description,
+                        'network_name', n.network_name,
+                        'created_at', n.created_at,
+                        'user_id', n.user_id,
+                        'user_name', u.name
+                    ),
+                    'devices', json((
+                        SELECT json_group_array(json_object(
+                            'id', id, 'device_name', device_name, 'type', type, 'status', status
+                        ))
+                        FROM (
+                            SELECT id, device_name, type, status 
+                            FROM devices 
+                            WHERE network_id = n.id 
+                            ORDER BY type, device_name
+                        )
+                    )),
+                    'data_sources', json((
+                        SELECT json_group_array(json_object(
+                            'id', id, 'datasource_name', datasource_name,
+                            'type', type, 'last_update', last_update
+                        ))
+                        FROM data_sources 
+                        WHERE network_id = n.id
+                    )),
+                    'total_connections', (
+                        SELECT COUNT(*) 
+                        FROM devices d 
+                        JOIN device_connections dc ON dc.device_id = d.id 
+                        WHERE d.network_id = n.id
+                    )
+                ) AS payload
+                FROM iot_networks n 
+                LEFT JOIN users u ON n.user_id = u.id 
+                WHERE n.id = ?
+            ''', (network_id,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return {}
+            
+            details = json.loads(row['payload'])
+            devices = details['devices']
+            data_sources = details['data_sources']
+            
+            # Последние анализы
+            cursor.execute('''
+                SELECT id, centrality_score, date 
+                FROM analysis 
+                WHERE network_id = ? 
+                ORDER BY date DESC 
+                LIMIT 5
+            ''', (network_id,))
+            analyses = [dict(row) for row in cursor]
+            
+            return {
+                'network': details['network'],
+                'devices': devices,
+                'data_sources': data_sources,
+                'analyses': analyses,
+                'stats': {
+                    'total_devices': len(devices),
+                    'total_data_sources': len(data_sources),
+                    'total_analyses': len(analyses),
+                    'total_connections': details['total_connections']
+                }
             }
-        }
     
     def close(self):
-        """Закрыть соединение с БД"""
-        self.conn.close()
\ No newline at end of file
+        """Закрыть соединения с БД (повторный вызов ничего не делает)"""
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+            atexit.unregister(self.close)
+            
+            while self._read_pool is not None and not self._read_pool.empty():
+                self._read_pool.get_nowait().close()
+            
+            # Обновить статистику планировщика для таблиц, которые заметно
+            # изменились за время работы (обычно ничего не делает). Это
+            # необязательный шаг: если БД занята записью другого процесса,
+            # статистика обновится при следующем закрытии
+            try:
+                self.conn.execute('PRAGMA optimize')
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                self.conn.close()
\ No newline at end of file
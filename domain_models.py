@@ -25,6 +25,25 @@ class DataSourceType(Enum):
     STREAM = "stream"
 
 
+class EnumByValue(dict):
+    """
+    Поиск элементов перечисления по значению словарем, без вызова Enum.__call__
+    Для неизвестного значения выбрасывает ValueError, как и само перечисление
+    """
+    
+    def __init__(self, enum_cls):
+        super().__init__((member.value, member) for member in enum_cls)
+        self.enum_cls = enum_cls
+    
+    def __missing__(self, value):
+        raise ValueError(f"{value!r} is not a valid {self.enum_cls.__name__}")
+
+
+DEVICE_STATUS_BY_VALUE = EnumByValue(DeviceStatus)
+DEVICE_TYPE_BY_VALUE = EnumByValue(DeviceType)
+DATA_SOURCE_TYPE_BY_VALUE = EnumByValue(DataSourceType)
+
+
 @dataclass
 class Device:
     """Доменная модель устройства IoT"""
@@ -113,33 +132,35 @@ class IoTNetwork:
         ]
         
         # 2. Найти избыточные связи (дублирующиеся или симметричные)
+        # Множества связей строятся один раз, чтобы проверка обратной
+        # связи не просматривала список на каждой итерации
+        connection_sets = {
+            device_id: set(device.connections)
+            for device_id, device in self._devices.items()
+        }
         redundant_links = []
         seen_links: Set[Tuple[int, int]] = set()
         
         for device_id, device in self._devices.items():
             for connected_id in device.connections:
-                link = tuple(sorted((device_id, connected_id)))
+                link = (device_id, connected_id) if device_id < connected_id else (connected_id, device_id)
                 
                 if link in seen_links:
                     # Дублирующаяся связь
                     redundant_links.append(link)
-                elif (connected_id in self._devices and 
-                      device_id in self._devices[connected_id].connections):
+                elif device_id in connection_sets.get(connected_id, ()):
                     # Симметричная связь (уже учтена с другой стороны)
                     redundant_links.append(link)
                 else:
                     seen_links.add(link)
         
         # 3. Рассчитать центральность сети (степенная центральность)
-        centrality_scores = []
-        for device in self._devices.values():
-            degree = len(device.connections)
-            max_possible_degree = len(self._devices) - 1
-            if max_possible_degree > 0:
-                centrality = degree / max_possible_degree
-                centrality_scores.append(centrality)
-        
-        avg_centrality = sum(centrality_scores) / len(centrality_scores) if centrality_scores else 0
+        max_possible_degree = len(self._devices) - 1
+        if max_possible_degree > 0:
+            total_degree = sum(len(device.connections) for device in self._devices.values())
+            avg_centrality = total_degree / max_possible_degree / len(self._devices)
+        else:
+            avg_centrality = 0
         
         # 4. Создать результат анализа
         self._analysis = AnalysisResult(
@@ -1,70 +1,125 @@
 # gateways.py
 import sqlite3
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from domain_models import (
-    Device, DeviceStatus, DeviceType, 
-    DataSource, DataSourceType,
-    AnalysisResult, IoTNetwork
+    Device, DataSource,
+    AnalysisResult, IoTNetwork,
+    DEVICE_STATUS_BY_VALUE, DEVICE_TYPE_BY_VALUE, DATA_SOURCE_TYPE_BY_VALUE
 )
 
 
+# Ограничение SQLite на число параметров в одном запросе
+SQLITE_MAX_VARIABLES = 999
+
+
+def _batches(rows: list, row_width: int):
+    """Разбить строки на пакеты, укладывающиеся в лимит параметров SQLite"""
+    batch_size = SQLITE_MAX_VARIABLES // row_width
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def _tuple_cursor(connection: sqlite3.Connection) -> sqlite3.Cursor:
+    """Курсор, возвращающий строки кортежами вместо sqlite3.Row"""
+    cursor = connection.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
 class DeviceGateway:
     """Gateway для работы с устройствами в БД"""
     
     def __init__(self, connection: sqlite3.Connection):
         self.conn = connection
     
-    def insert(self, device: Device, network_id: int) -> int:
-        """Вставить устройство в БД"""
+    def insert_many(self, devices: List[Device], network_id: int) -> List[int]:
+        """
+        Вставить несколько устройств в БД
+        Фиксацию транзакции выполняет вызывающий код
+        """
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO devices (device_name, status, type, network_id)
-            VALUES (?, ?, ?, ?)
-        ''', (device.device_name, device.status.value, device.type.value, network_id))
+        device_ids = []
+        
+        # Многострочный INSERT: один оператор на пакет устройств
+        for batch in _batches(devices, 4):
+            cursor.execute(
+                'INSERT INTO devices (device_name, status, type, network_id) VALUES '
+                + ', '.join(['(?, ?, ?, ?)'] * len(batch)),
+                [
+                    value
+                    for device in batch
+                    for value in (device.device_name, device.status.value, device.type.value, network_id)
+                ]
+            )
+            
+            # AUTOINCREMENT выдает идентификаторы подряд в порядке строк VALUES,
+            # lastrowid указывает на последнюю вставленную строку
+            first_id = cursor.lastrowid - len(batch) + 1
+            for offset, device in enumerate(batch):
+                device.id = first_id + offset
+                device_ids.append(device.id)
         
-        device_id = cursor.lastrowid
-        device.id = device_id
+        # Сохранить связи всех устройств
+        self.insert_connections([
+            (device.id, connected_id)
+            for device in devices
+            for connected_id in device.connections
+        ])
         
-        # Сохранить связи устройства
-        for connected_id in device.connections:
-            cursor.execute('''
-                INSERT INTO device_connections (device_id, connected_device_id)
-                VALUES (?, ?)
-            ''', (device_id, connected_id))
+        return device_ids
+    
+    def insert_connections(self, connections: List[Tuple[int, int]]):
+        """
+        Вставить связи между устройствами
+        Фиксацию транзакции выполняет вызывающий код
+        """
+        cursor = self.conn.cursor()
         
-        self.conn.commit()
-        return device_id
+        for batch in _batches(connections, 2):
+            cursor.execute(
+                'INSERT INTO device_connections (device_id, connected_device_id) VALUES '
+                + ', '.join(['(?, ?)'] * len(batch)),
+                [value for connection in batch for value in connection]
+            )
     
     def find_by_network(self, network_id: int) -> List[Device]:
         """Найти все устройства сети"""
-        cursor = self.conn.cursor()
+        cursor = _tuple_cursor(self.conn)
         
         # Получить устройства
         cursor.execute('''
             SELECT id, device_name, status, type 
             FROM devices 
-            WHERE network_id = ?
+            WHERE network_id = ? 
+            ORDER BY id
+        ''', (network_id,))
+        
+        device_rows = cursor.fetchall()
+        
+        # Получить связи всех устройств сети одним запросом
+        cursor.execute('''
+            SELECT dc.device_id, dc.connected_device_id 
+            FROM device_connections dc 
+            JOIN devices d ON d.id = dc.device_id 
+            WHERE d.network_id = ? 
+            ORDER BY dc.id
         ''', (network_id,))
         
+        connections_by_device: Dict[int, List[int]] = {}
+        for device_id, connected_id in cursor:
+            connections_by_device.setdefault(device_id, []).append(connected_id)
+        
         devices = []
-        for row in cursor.fetchall():
+        for row in device_rows:
             device_id, name, status_str, type_str = row
-            
-            # Получить связи устройства
-            cursor.execute('''
-                SELECT connected_device_id 
-                FROM device_connections 
-                WHERE device_id = ?
-            ''', (device_id,))
-            
-            connections = [row[0] for row in cursor.fetchall()]
+            connections = connections_by_device.get(device_id, [])
             
             device = Device(
                 id=device_id,
                 device_name=name,
-                status=DeviceStatus(status_str),
-                type=DeviceType(type_str),
+                status=DEVICE_STATUS_BY_VALUE[status_str],
+                type=DEVICE_TYPE_BY_VALUE[type_str],
                 connections=connections
             )
             devices.append(device)
@@ -78,27 +133,42 @@ class DataSourceGateway:
     def __init__(self, connection: sqlite3.Connection):
         self.conn = connection
     
-    def insert(self, data_source: DataSource, network_id: int) -> int:
-        """Вставить источник данных в БД"""
+    def insert_many(self, data_sources: List[DataSource], network_id: int) -> List[int]:
+        """
+        Вставить несколько источников данных в БД
+        Фиксацию транзакции выполняет вызывающий код
+        """
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO data_sources (datasource_name, last_update, type, network_id)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            data_source.datasource_name,
-            data_source.last_update.isoformat(),
-            data_source.type.value,
-            network_id
-        ))
-        
-        data_source_id = cursor.lastrowid
-        data_source.id = data_source_id
-        self.conn.commit()
-        return data_source_id
+        data_source_ids = []
+        
+        # Многострочный INSERT, идентификаторы восстанавливаются по lastrowid
+        # так же, как для устройств
+        for batch in _batches(data_sources, 4):
+            cursor.execute(
+                'INSERT INTO data_sources (datasource_name, last_update, type, network_id) VALUES '
+                + ', '.join(['(?, ?, ?, ?)'] * len(batch)),
+                [
+                    value
+                    for data_source in batch
+                    for value in (
+                        data_source.datasource_name,
+                        data_source.last_update.isoformat(),
+                        data_source.type.value,
+                        network_id
+                    )
+                ]
+            )
+            
+            first_id = cursor.lastrowid - len(batch) + 1
+            for offset, data_source in enumerate(batch):
+                data_source.id = first_id + offset
+                data_source_ids.append(data_source.id)
+        
+        return data_source_ids
     
     def find_by_network(self, network_id: int) -> List[DataSource]:
         """Найти все источники данных сети"""
-        cursor = self.conn.cursor()
+        cursor = _tuple_cursor(self.conn)
         cursor.execute('''
             SELECT id, datasource_name, last_update, type 
             FROM data_sources 
@@ -106,14 +176,14 @@ class DataSourceGateway:
         ''', (network_id,))
         
         data_sources = []
-        for row in cursor.fetchall():
+        for row in cursor:
             ds_id, name, last_update_str, type_str = row
             
             data_source = DataSource(
                 id=ds_id,
                 datasource_name=name,
                 last_update=datetime.fromisoformat(last_update_str),
-                type=DataSourceType(type_str)
+                type=DATA_SOURCE_TYPE_BY_VALUE[type_str]
             )
             data_sources.append(data_source)
         
@@ -130,6 +200,9 @@ class AnalysisGateway:
         """Вставить результат анализа в БД"""
         cursor = self.conn.cursor()
         
+        # Результат и его детали сохраняются одной транзакцией
+        cursor.execute('BEGIN IMMEDIATE')
+        
         # Вставить основной результат
         cursor.execute('''
             INSERT INTO analysis (centrality_score, date, network_id)
@@ -140,25 +213,23 @@ class AnalysisGateway:
         analysis.id = analysis_id
         
         # Вставить изолированные узлы
-        for node_id in analysis.isolated_nodes:
-            cursor.execute('''
-                INSERT INTO isolated_nodes (analysis_id, device_id)
-                VALUES (?, ?)
-            ''', (analysis_id, node_id))
+        cursor.executemany('''
+            INSERT INTO isolated_nodes (analysis_id, device_id)
+            VALUES (?, ?)
+        ''', [(analysis_id, node_id) for node_id in analysis.isolated_nodes])
         
         # Вставить избыточные связи
-        for link in analysis.redundant_links:
-            cursor.execute('''
-                INSERT INTO redundant_links (analysis_id, device_id1, device_id2)
-                VALUES (?, ?, ?)
-            ''', (analysis_id, link[0], link[1]))
+        cursor.executemany('''
+            INSERT INTO redundant_links (analysis_id, device_id1, device_id2)
+            VALUES (?, ?, ?)
+        ''', [(analysis_id, link[0], link[1]) for link in analysis.redundant_links])
         
         self.conn.commit()
         return analysis_id
     
     def find_by_network(self, network_id: int) -> Optional[AnalysisResult]:
         """Найти последний анализ сети"""
-        cursor = self.conn.cursor()
+        cursor = _tuple_cursor(self.conn)
         
         # Получить основной результат
         cursor.execute('''
@@ -182,7 +253,7 @@ class AnalysisGateway:
             WHERE analysis_id = ?
         ''', (analysis_id,))
         
-        isolated_nodes = [row[0] for row in cursor.fetchall()]
+        isolated_nodes = [row[0] for row in cursor]
         
         # Получить избыточные связи
         cursor.execute('''
@@ -191,7 +262,7 @@ class AnalysisGateway:
             WHERE analysis_id = ?
         ''', (analysis_id,))
         
-        redundant_links = [(row[0], row[1]) for row in cursor.fetchall()]
+        redundant_links = [(row[0], row[1]) for row in cursor]
         
         return AnalysisResult(
             id=analysis_id,
@@ -222,7 +293,7 @@ class IoTNetworkGateway:
     
     def find_by_id(self, network_id: int) -> Optional[IoTNetwork]:
         """Найти сеть по ID"""
-        cursor = self.conn.cursor()
+        cursor = _tuple_cursor(self.conn)
         cursor.execute('''
             SELECT id, description, network_name 
             FROM iot_networks 
@@ -0,0 +1,14 @@
+# gunicorn.conf.py
+# Запуск: FLASK_SECRET_KEY=<случайный ключ> gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+
+bind = '0.0.0.0:5000'
+
+# sqlite3 блокирует поток на время запроса к БД, поэтому вместо gevent
+# используются отдельные процессы, каждый со своим соединением
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_class = 'sync'
+
+# Приложение загружается в каждом воркере, чтобы соединение с БД
+# не наследовалось через fork
+preload_app = False
@@ -1,6 +1,6 @@
 # main.py
 from datetime import datetime, timedelta
-from app import IoTNetworkService
+from application import IoTNetworkService
 
 
 def main():